@@ -1,10 +1,12 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
+from scipy.special import ndtri
 import math
 from typing import Union, List, Tuple
 from dataclasses import dataclass
 
+from _sweep_kernels import HAVE_NUMBA, _sweep_binary, _sweep_continuous
+
 @dataclass
 class SampleSizeResult:
     """Class to store sample size calculation results for A/B testing experiments.
@@ -43,21 +45,63 @@ class SampleSizeCalculator:
         """
         self.significance_level = significance_level
         self.power = power
-        self.z_beta = stats.norm.ppf(power)
-        
+        self.z_beta = ndtri(power)
+        # 显著性水平、功效在实例生命周期内不变，临界值只需计算一次
+        # ndtri是norm.ppf底层的C ufunc，绕过rv_continuous的参数检查和广播开销
+        self._z_alpha_two_sided = ndtri(1 - significance_level / 2)
+        self._z_alpha_one_sided = ndtri(1 - significance_level)
+        self._z_sum_two_sided_sq = (self._z_alpha_two_sided + self.z_beta) ** 2
+        self._z_sum_one_sided_sq = (self._z_alpha_one_sided + self.z_beta) ** 2
+
     def _get_critical_value(self, is_two_sided: bool = True) -> float:
         """
-        Calculate the critical Z-value for the given significance level.
-        
+        Return the cached critical Z-value for the given significance level.
+
         Args:
             is_two_sided (bool): Whether to use two-sided test. Default is True.
-            
+
         Returns:
             float: The critical Z-value for the specified significance level
         """
         if is_two_sided:
-            return stats.norm.ppf(1 - self.significance_level / 2)
-        return stats.norm.ppf(1 - self.significance_level)
+            return self._z_alpha_two_sided
+        return self._z_alpha_one_sided
+
+    @staticmethod
+    def _compute_moments(x: Union[pd.Series, np.ndarray]) -> Tuple[float, float]:
+        """
+        Compute mean and sample variance of the data in a single pass.
+
+        Uses the two-moment identity var = (sum(x^2) - n*mean^2) / (n-1) so the
+        array is traversed once (two BLAS-level reductions) instead of the two
+        full passes that separate np.mean / np.var calls would take.
+
+        Args:
+            x (Union[pd.Series, np.ndarray]): Metric values
+
+        Returns:
+            Tuple[float, float]: (mean, sample variance with ddof=1)
+        """
+        x = np.asarray(x, dtype=np.float64)
+        n = x.size
+        mean = x.sum() / n
+        sumsq = np.dot(x, x)
+        variance = (sumsq - n * mean * mean) / (n - 1)
+        return mean, variance
+
+    def _get_z_sum_squared(self, is_two_sided: bool = True) -> float:
+        """
+        Return the cached squared sum of critical values (z_alpha + z_beta)^2.
+
+        Args:
+            is_two_sided (bool): Whether to use two-sided test. Default is True.
+
+        Returns:
+            float: (z_alpha + z_beta)^2 for the specified test type
+        """
+        if is_two_sided:
+            return self._z_sum_two_sided_sq
+        return self._z_sum_one_sided_sq
     
     def calculate_binary_metric_sample_size(self, baseline_rate: float, mde: float, k: float = 1, is_two_sided: bool = True) -> int:
         """
@@ -82,30 +126,35 @@ class SampleSizeCalculator:
             ...     mde=0.1
             ... )
         """
-        z_alpha = self._get_critical_value(is_two_sided)
+        if baseline_rate == 0 or mde == 0:
+            # 效应量为0，不存在有限样本量
+            return None
+        z_sum_sq = self._get_z_sum_squared(is_two_sided)
         var = baseline_rate * (1 - baseline_rate)
         delta = baseline_rate * mde
-        
-        n = (1/k * (baseline_rate + delta) * (1 - baseline_rate - delta) + var) * pow(z_alpha + self.z_beta, 2) / pow(delta, 2)
+
+        n = (1/k * (baseline_rate + delta) * (1 - baseline_rate - delta) + var) * z_sum_sq / (delta * delta)
         return math.ceil(n)
     
-    def calculate_continuous_metric_sample_size(self, data: pd.DataFrame, metric: str, mde: float, k: float = 1, is_two_sided: bool = True) -> int:
+    def calculate_continuous_metric_sample_size(self, data: Union[pd.DataFrame, np.ndarray], metric: str = None, mde: float = None, k: float = 1, is_two_sided: bool = True) -> int:
         """
         Calculate required sample size for continuous metrics (e.g., revenue, time spent).
-        
+
         This method is suitable for metrics that follow a normal distribution,
         such as revenue per user, time spent on site, or any other continuous variable.
-        
+
         Args:
-            data (pd.DataFrame): Data containing the metric values
-            metric (str): Name of the metric column in the dataframe
+            data (Union[pd.DataFrame, np.ndarray]): Data containing the metric values.
+                Can be a DataFrame (with `metric` naming the column) or a 1-D array
+                of values directly.
+            metric (str): Name of the metric column when `data` is a DataFrame
             mde (float): Minimum Detectable Effect as a proportion of baseline
             k (float): Ratio of treatment group size to control group size. Default is 1.
             is_two_sided (bool): Whether to use two-sided test. Default is True.
-            
+
         Returns:
             int: Required sample size for the control group
-            
+
         Example:
             >>> calculator = SampleSizeCalculator()
             >>> sample_size = calculator.calculate_continuous_metric_sample_size(
@@ -114,14 +163,70 @@ class SampleSizeCalculator:
             ...     mde=0.1
             ... )
         """
-        z_alpha = self._get_critical_value(is_two_sided)
-        baseline = np.mean(data[metric])
-        variance = np.var(data[metric], ddof=1)
+        z_sum_sq = self._get_z_sum_squared(is_two_sided)
+        x = data[metric] if isinstance(data, pd.DataFrame) else data
+        baseline, variance = self._compute_moments(x)
         effect_size = mde * baseline
-        
-        sample_size = ((1 + 1/k) * pow(z_alpha + self.z_beta, 2) * variance) / pow(effect_size, 2)
+        if effect_size == 0:
+            # 效应量为0，不存在有限样本量
+            return None
+
+        sample_size = ((1 + 1/k) * z_sum_sq * variance) / (effect_size * effect_size)
         return math.ceil(sample_size)
     
+    def calculate_binary_metric_sample_size_vec(self, baseline_rate: float, mde_arr: np.ndarray, k: float = 1, is_two_sided: bool = True) -> np.ndarray:
+        """
+        Vectorized version of calculate_binary_metric_sample_size for an array of MDEs.
+
+        Computes the sample size formula on the whole MDE array at once with NumPy,
+        avoiding a Python-level loop over individual MDE values.
+
+        Args:
+            baseline_rate (float): The expected rate in the control group (0-1)
+            mde_arr (np.ndarray): Array of Minimum Detectable Effects as proportions of baseline
+            k (float): Ratio of treatment group size to control group size. Default is 1.
+            is_two_sided (bool): Whether to use two-sided test. Default is True.
+
+        Returns:
+            np.ndarray: Required control group sample size for each MDE (int64).
+                Degenerate points (zero baseline or MDE, i.e. zero effect size)
+                are returned as -1.
+        """
+        z_sum_sq = self._get_z_sum_squared(is_two_sided)
+        var = baseline_rate * (1 - baseline_rate)
+        delta = baseline_rate * mde_arr
+
+        # 全数组一次算完再回填哨兵值：连续的ufunc过程比掩码切片的
+        # fancy indexing拷贝更快，除零产生的inf在astype前已被替换
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = (1/k * (baseline_rate + delta) * (1 - baseline_rate - delta) + var) * z_sum_sq / (delta * delta)
+        return np.where(delta != 0, np.ceil(n), -1).astype(np.int64)
+
+    def calculate_continuous_metric_sample_size_from_params_vec(self, baseline_value: float, variance: float, mde_arr: np.ndarray, k: float = 1, is_two_sided: bool = True) -> np.ndarray:
+        """
+        Vectorized version of calculate_continuous_metric_sample_size_from_params for an array of MDEs.
+
+        Args:
+            baseline_value (float): The baseline/mean value of the metric
+            variance (float): The variance of the metric
+            mde_arr (np.ndarray): Array of Minimum Detectable Effects as proportions of baseline
+            k (float): Ratio of treatment group size to control group size. Default is 1.
+            is_two_sided (bool): Whether to use two-sided test. Default is True.
+
+        Returns:
+            np.ndarray: Required control group sample size for each MDE (int64).
+                Degenerate points (zero baseline or MDE, i.e. zero effect size)
+                are returned as -1.
+        """
+        z_sum_sq = self._get_z_sum_squared(is_two_sided)
+        effect_size = baseline_value * mde_arr
+
+        # 全数组一次算完再回填哨兵值：连续的ufunc过程比掩码切片的
+        # fancy indexing拷贝更快，除零产生的inf在astype前已被替换
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = ((1 + 1/k) * z_sum_sq * variance) / (effect_size * effect_size)
+        return np.where(effect_size != 0, np.ceil(n), -1).astype(np.int64)
+
     def calculate_continuous_metric_sample_size_from_params(self, baseline_value: float, variance: float, mde: float, k: float = 1, is_two_sided: bool = True) -> int:
         """
         Calculate required sample size for continuous metrics using baseline value and variance directly.
@@ -138,12 +243,59 @@ class SampleSizeCalculator:
         Returns:
             int: Required sample size for the control group
         """
-        z_alpha = self._get_critical_value(is_two_sided)
+        if baseline_value == 0 or mde == 0:
+            # 效应量为0，不存在有限样本量
+            return None
+        z_sum_sq = self._get_z_sum_squared(is_two_sided)
         effect_size = mde * baseline_value
-        
-        sample_size = ((1 + 1/k) * pow(z_alpha + self.z_beta, 2) * variance) / pow(effect_size, 2)
+
+        sample_size = ((1 + 1/k) * z_sum_sq * variance) / (effect_size * effect_size)
         return math.ceil(sample_size)
     
+    def _sweep_metric(self, metric_type: str, baseline: float, variance: float, mde_arr: np.ndarray,
+                      k: float, z_sum_sq: float, group_num: int, daily_traffic: int,
+                      sample_ratio: float, is_two_sided: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Run the sample-size sweep for one metric over an array of MDEs.
+
+        Dispatches to the compiled numba kernels when available, otherwise to
+        the NumPy vectorized formulas.
+
+        Returns:
+            Tuple of int64 arrays: (control, treatment, total, experiment_days)
+        """
+        if HAVE_NUMBA:
+            if metric_type == 'mean':
+                return _sweep_continuous(baseline, variance, mde_arr, float(k), z_sum_sq, group_num, daily_traffic, sample_ratio)
+            return _sweep_binary(baseline, mde_arr, float(k), z_sum_sq, group_num, daily_traffic, sample_ratio)
+
+        if metric_type == 'mean':
+            control = self.calculate_continuous_metric_sample_size_from_params_vec(baseline, variance, mde_arr, k, is_two_sided)
+        else:
+            control = self.calculate_binary_metric_sample_size_vec(baseline, mde_arr, k, is_two_sided)
+
+        if k == 1:
+            # 默认流量比下实验组与对照组完全相同，省掉一次ufunc和类型转换
+            treated = control
+            total = control * group_num
+        else:
+            treated = np.ceil(control * k).astype(np.int64)
+            total = control + treated * (group_num - 1)
+        denom = daily_traffic * sample_ratio
+        if denom > 0 and float(denom).is_integer():
+            # 分母为整数时用纯整数上取整除法，避免浮点除法和类型转换
+            exp_days = -(-total // int(denom))
+        else:
+            exp_days = np.ceil(total / denom).astype(np.int64)
+
+        # 基准值或MDE为0的点带-1哨兵值，派生列同样置为-1
+        invalid = control < 0
+        if invalid.any():
+            treated = np.where(invalid, -1, treated)
+            total = np.where(invalid, -1, total)
+            exp_days = np.where(invalid, -1, exp_days)
+        return control, treated, total, exp_days
+
     def calculate_experiment_requirements(
         self,
         data: pd.DataFrame,
@@ -154,7 +306,8 @@ class SampleSizeCalculator:
         sample_ratio: float,
         k: float = 1,
         group_num: int = 2,
-        is_two_sided: bool = True
+        is_two_sided: bool = True,
+        chunk_size: int = 4096
     ) -> pd.DataFrame:
         """
         Calculate comprehensive experiment requirements for multiple metrics and MDEs.
@@ -172,6 +325,9 @@ class SampleSizeCalculator:
             k (float): Ratio of treatment group proportion to control group proportion. Default is 1, meaning treatment group has the same proportion as control group.
             group_num (int): Number of experimental groups. Default is 2 (control + treatment).
             is_two_sided (bool): Whether to use two-sided test. Default is True.
+            chunk_size (int): Maximum number of MDE points processed per batch. Very
+                fine-grained sweeps are split into chunks of this size so peak memory
+                stays bounded while keeping the vectorization benefit. Default is 4096.
             
         Returns:
             pd.DataFrame: DataFrame containing the following columns:
@@ -196,27 +352,41 @@ class SampleSizeCalculator:
         """
         results = []
         start, end, step = mde_range
-        
+
+        z_sum_sq = self._get_z_sum_squared(is_two_sided)
+        # MDE数组与指标无关，循环外计算一次并在所有指标间复用；
+        # round避免浮点步长累积误差影响展示值
+        mde_arr = np.round(np.arange(start, end, step), 6)
+
         for metric, metric_type in zip(metrics, metric_types):
-            for mde in np.arange(start, end, step):
-                if metric_type == 'mean':
-                    control_sample = self.calculate_continuous_metric_sample_size(data, metric, mde, k, is_two_sided)
-                elif metric_type == 'proportion':
-                    baseline = np.mean(data[metric])
-                    control_sample = self.calculate_binary_metric_sample_size(baseline, mde, k, is_two_sided)
-                
-                treated_sample = math.ceil(control_sample * k)
-                total_sample = control_sample + treated_sample * (group_num - 1)
-                exp_days = math.ceil(total_sample / (daily_traffic * sample_ratio))
-                
-                results.append({
-                    'metric_name': str(metric),
-                    'mde': mde,
-                    'control_sample_size': control_sample,
-                    'treatment_sample_size': treated_sample,
-                    'total_sample_size': total_sample,
-                    'experiment_days': exp_days
-                })
-        
-        return pd.DataFrame(results)
+            if metric_type == 'mean':
+                baseline, variance = self._compute_moments(data[metric])
+            elif metric_type == 'proportion':
+                baseline = np.mean(data[metric])
+                variance = None
+
+            if mde_arr.size > chunk_size:
+                # 超大扫描分块计算，瞬时内存保持在O(chunk_size)
+                parts = [
+                    self._sweep_metric(metric_type, baseline, variance, chunk, k, z_sum_sq,
+                                       group_num, daily_traffic, sample_ratio, is_two_sided)
+                    for chunk in np.array_split(mde_arr, math.ceil(mde_arr.size / chunk_size))
+                ]
+                control, treated, total, exp_days = (np.concatenate(p) for p in zip(*parts))
+            else:
+                control, treated, total, exp_days = self._sweep_metric(
+                    metric_type, baseline, variance, mde_arr, k, z_sum_sq,
+                    group_num, daily_traffic, sample_ratio, is_two_sided)
+
+            # 显式指定各列dtype，跳过pandas逐列类型推断
+            results.append(pd.DataFrame({
+                'metric_name': pd.array([str(metric)] * mde_arr.size, dtype='string'),
+                'mde': mde_arr.astype(np.float64, copy=False),
+                'control_sample_size': control.astype(np.int64, copy=False),
+                'treatment_sample_size': treated.astype(np.int64, copy=False),
+                'total_sample_size': total.astype(np.int64, copy=False),
+                'experiment_days': exp_days.astype(np.int64, copy=False)
+            }))
+
+        return pd.concat(results, ignore_index=True)
 
@@ -0,0 +1,118 @@
+"""
+Optional numba-compiled kernels for the MDE sweep.
+
+numba is not a hard dependency: when it is installed, the kernels below are
+JIT-compiled (with on-disk caching so the compile cost is paid once per
+install); otherwise they stay plain Python and SampleSizeCalculator uses its
+NumPy vectorized path instead.
+"""
+
+import math
+
+import numpy as np
+
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    numba = None
+    HAVE_NUMBA = False
+
+
+def _sweep_binary(baseline_rate, mde_arr, k, z_sum_sq, group_num, daily_traffic, sample_ratio):
+    """
+    Compiled sweep for binary metrics over an array of MDEs.
+
+    Args:
+        baseline_rate (float): Expected rate in the control group (0-1)
+        mde_arr (np.ndarray): MDE values as proportions of baseline
+        k (float): Ratio of treatment group size to control group size
+        z_sum_sq (float): Precomputed (z_alpha + z_beta)^2
+        group_num (int): Number of experimental groups including control
+        daily_traffic (int): Expected daily traffic
+        sample_ratio (float): Ratio of traffic included in the experiment
+
+    Returns:
+        Tuple of int64 arrays: (control, treatment, total, experiment_days)
+    """
+    n_points = mde_arr.size
+    control = np.empty(n_points, dtype=np.int64)
+    treated = np.empty(n_points, dtype=np.int64)
+    total = np.empty(n_points, dtype=np.int64)
+    days = np.empty(n_points, dtype=np.int64)
+    var = baseline_rate * (1 - baseline_rate)
+    denom = daily_traffic * sample_ratio
+    k_is_one = k == 1.0
+
+    for i in range(n_points):
+        delta = baseline_rate * mde_arr[i]
+        if delta == 0.0:
+            # 效应量为0的点用-1哨兵值标记，避免除零
+            control[i] = -1
+            treated[i] = -1
+            total[i] = -1
+            days[i] = -1
+            continue
+        n = (1/k * (baseline_rate + delta) * (1 - baseline_rate - delta) + var) * z_sum_sq / (delta * delta)
+        control[i] = math.ceil(n)
+        if k_is_one:
+            treated[i] = control[i]
+            total[i] = control[i] * group_num
+        else:
+            treated[i] = math.ceil(control[i] * k)
+            total[i] = control[i] + treated[i] * (group_num - 1)
+        days[i] = math.ceil(total[i] / denom)
+
+    return control, treated, total, days
+
+
+def _sweep_continuous(baseline_value, variance, mde_arr, k, z_sum_sq, group_num, daily_traffic, sample_ratio):
+    """
+    Compiled sweep for continuous metrics over an array of MDEs.
+
+    Args:
+        baseline_value (float): Baseline/mean value of the metric
+        variance (float): Variance of the metric
+        mde_arr (np.ndarray): MDE values as proportions of baseline
+        k (float): Ratio of treatment group size to control group size
+        z_sum_sq (float): Precomputed (z_alpha + z_beta)^2
+        group_num (int): Number of experimental groups including control
+        daily_traffic (int): Expected daily traffic
+        sample_ratio (float): Ratio of traffic included in the experiment
+
+    Returns:
+        Tuple of int64 arrays: (control, treatment, total, experiment_days)
+    """
+    n_points = mde_arr.size
+    control = np.empty(n_points, dtype=np.int64)
+    treated = np.empty(n_points, dtype=np.int64)
+    total = np.empty(n_points, dtype=np.int64)
+    days = np.empty(n_points, dtype=np.int64)
+    denom = daily_traffic * sample_ratio
+    k_is_one = k == 1.0
+
+    for i in range(n_points):
+        effect_size = baseline_value * mde_arr[i]
+        if effect_size == 0.0:
+            # 效应量为0的点用-1哨兵值标记，避免除零
+            control[i] = -1
+            treated[i] = -1
+            total[i] = -1
+            days[i] = -1
+            continue
+        n = ((1 + 1/k) * z_sum_sq * variance) / (effect_size * effect_size)
+        control[i] = math.ceil(n)
+        if k_is_one:
+            treated[i] = control[i]
+            total[i] = control[i] * group_num
+        else:
+            treated[i] = math.ceil(control[i] * k)
+            total[i] = control[i] + treated[i] * (group_num - 1)
+        days[i] = math.ceil(total[i] / denom)
+
+    return control, treated, total, days
+
+
+if HAVE_NUMBA:
+    _sweep_binary = numba.njit(cache=True, fastmath=True)(_sweep_binary)
+    _sweep_continuous = numba.njit(cache=True, fastmath=True)(_sweep_continuous)
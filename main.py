@@ -3,13 +3,14 @@ A/B测试样本量计算器 - Streamlit应用
 用于精确计算A/B测试所需的样本量
 """
 
+import io
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from SampleCalculator import SampleSizeCalculator
-import math
 
 # 页面配置
 st.set_page_config(
@@ -19,14 +20,95 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 缓存辅助函数：Streamlit每次交互都会重跑整个脚本，
+# 用st.cache_data/st.cache_resource避免重复解析CSV、重建计算器和重算结果
+@st.cache_data
+def load_stats(file_bytes: bytes):
+    """解析上传的CSV，返回第一列数据的(均值, 方差, 有效样本数)。"""
+    try:
+        # 快路径：C解析器只解析第一列并直接产出float64，其余列在解析阶段即被跳过
+        df = pd.read_csv(io.BytesIO(file_bytes), usecols=[0], dtype=np.float64, engine='c')
+        arr = df.iloc[:, 0].to_numpy()
+    except (ValueError, TypeError):
+        # 回退：第一列混有非数值字符串，逐元素强制转换
+        df = pd.read_csv(io.BytesIO(file_bytes), usecols=[0])
+        if len(df) == 0:
+            return None, None, 0
+        arr = pd.to_numeric(df.iloc[:, 0], errors='coerce').to_numpy(dtype=np.float64)
+    arr = arr[~np.isnan(arr)]
+    if arr.size == 0:
+        return None, None, 0
+    return float(arr.mean()), float(arr.var(ddof=1)), int(arr.size)
+
+
+@st.cache_resource
+def get_calculator(significance_level: float, power: float) -> SampleSizeCalculator:
+    """按(显著性水平, 功效)缓存SampleSizeCalculator实例。"""
+    return SampleSizeCalculator(significance_level=significance_level, power=power)
+
+
+@st.cache_data
+def compute_sweep(metric_type, baseline_value, variance, mde_array, k_value,
+                  group_num, daily_traffic, traffic_ratio,
+                  significance_level, power) -> pd.DataFrame:
+    """对整个MDE数组做向量化样本量计算，返回结果DataFrame。"""
+    calculator = get_calculator(significance_level, power)
+
+    if metric_type == "比例":
+        control_samples = calculator.calculate_binary_metric_sample_size_vec(
+            baseline_value, mde_array, k_value
+        )
+    else:  # 均值
+        # 使用基准值和方差直接计算
+        control_samples = calculator.calculate_continuous_metric_sample_size_from_params_vec(
+            baseline_value, variance, mde_array, k_value
+        )
+
+    # 基准值或MDE为0的点（-1哨兵值）无法计算，直接剔除
+    valid = control_samples >= 0
+    if not valid.all():
+        mde_array = mde_array[valid]
+        control_samples = control_samples[valid]
+
+    if k_value == 1:
+        # 默认流量比下实验组与对照组样本量相同，省掉一次ufunc和类型转换
+        treatment_samples = control_samples
+        total_samples = control_samples * (1 + group_num)
+    else:
+        treatment_samples = np.ceil(control_samples * k_value).astype(np.int64)
+        total_samples = control_samples + treatment_samples * group_num
+    denom = daily_traffic * traffic_ratio
+    if denom > 0 and float(denom).is_integer():
+        # 分母为整数时用纯整数上取整除法，避免浮点除法和类型转换
+        experiment_days = -(-total_samples // int(denom))
+    else:
+        experiment_days = np.ceil(total_samples / denom).astype(np.int64)
+
+    # 按列构建DataFrame，避免逐行追加
+    return pd.DataFrame({
+        'MDE': [f"{mde * 100:.2f}%" for mde in mde_array],
+        'MDE值': mde_array,
+        '对照组': control_samples,
+        '每组实验组': treatment_samples,
+        '总样本': total_samples,
+        '实验天数': experiment_days
+    })
+
+
+@st.cache_data
+def _to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """将结果DataFrame序列化为UTF-8编码的CSV字节串（按内容缓存）。"""
+    return df.to_csv(index=False).encode('utf-8')
+
+
 # 初始化session_state
 if 'baseline_from_file' not in st.session_state:
     st.session_state.baseline_from_file = None
 if 'variance_from_file' not in st.session_state:
     st.session_state.variance_from_file = None
 
-# 自定义CSS样式
-st.markdown("""
+# 自定义CSS样式（模块级常量，rerun时无需重新拼接字符串）
+_CSS = """
 <style>
     .main-header {
         text-align: center;
@@ -87,7 +169,27 @@ st.markdown("""
         visibility: visible !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# 初始状态的三张说明卡片，合并为一次st.markdown调用（flex布局保持并排）
+_INTRO_CARDS = """
+<div style="display: flex; gap: 20px;">
+    <div class="metric-card" style="flex: 1;">
+        <h3>📊 参数设置</h3>
+        <p>配置实验参数以计算所需样本量</p>
+    </div>
+    <div class="metric-card" style="flex: 1;">
+        <h3>📈 结果展示</h3>
+        <p>查看计算结果表和趋势图</p>
+    </div>
+    <div class="metric-card" style="flex: 1;">
+        <h3>💾 数据导出</h3>
+        <p>导出计算结果为CSV文件</p>
+    </div>
+</div>
+"""
+
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # 标题
 st.markdown('<h1 class="main-header">🧮 样本量计算器</h1>', unsafe_allow_html=True)
@@ -109,21 +211,16 @@ with st.sidebar:
     # 如果上传了文件，处理数据
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
-            if len(df) > 0:
-                # 获取第一列数据
-                first_column = df.columns[0]
-                values = pd.to_numeric(df[first_column], errors='coerce').dropna()
-                
-                if len(values) > 0:
-                    st.session_state.baseline_from_file = values.mean()
-                    st.session_state.variance_from_file = values.var(ddof=1)
-                    st.success(f"✅ 成功读取文件: {uploaded_file.name}")
-                    st.info(f"基准值: {st.session_state.baseline_from_file:.6f}\n方差: {st.session_state.variance_from_file:.6f}")
-                else:
-                    st.error("无法从CSV文件中提取数值数据")
-                    st.session_state.baseline_from_file = None
-                    st.session_state.variance_from_file = None
+            baseline, variance_val, valid_count = load_stats(uploaded_file.getvalue())
+            if valid_count > 0:
+                st.session_state.baseline_from_file = baseline
+                st.session_state.variance_from_file = variance_val
+                st.success(f"✅ 成功读取文件: {uploaded_file.name}")
+                st.info(f"基准值: {st.session_state.baseline_from_file:.6f}\n方差: {st.session_state.variance_from_file:.6f}")
+            else:
+                st.error("无法从CSV文件中提取数值数据")
+                st.session_state.baseline_from_file = None
+                st.session_state.variance_from_file = None
         except Exception as e:
             st.error(f"文件读取失败: {str(e)}")
             st.session_state.baseline_from_file = None
@@ -142,49 +239,29 @@ with st.sidebar:
         help="选择指标类型：比例（如转化率）或均值（如平均收入）"
     )
     
-    # 基准值
-    if st.session_state.baseline_from_file is not None:
-        baseline_value = st.number_input(
-            "基准值 *",
-            min_value=0.0,
-            value=st.session_state.baseline_from_file,
-            step=0.001,
-            format="%.6f",
-            help="对照组的预期指标值（已从CSV文件自动填充）",
-            key="baseline_input"
-        )
-    else:
-        baseline_value = st.number_input(
-            "基准值 *",
-            min_value=0.0,
-            value=0.06,
-            step=0.001,
-            format="%.6f",
-            help="对照组的预期指标值",
-            key="baseline_input"
-        )
-    
+    # 基准值（上传了CSV时用文件统计值作为默认值）
+    from_file = st.session_state.baseline_from_file is not None
+    file_suffix = "（已从CSV文件自动填充）" if from_file else ""
+    baseline_value = st.number_input(
+        "基准值 *",
+        min_value=0.0,
+        value=st.session_state.baseline_from_file if from_file else 0.06,
+        step=0.001,
+        format="%.6f",
+        help="对照组的预期指标值" + file_suffix,
+        key="baseline_input"
+    )
+
     # 方差
-    if st.session_state.variance_from_file is not None:
-        variance = st.number_input(
-            "方差 *",
-            min_value=0.0,
-            value=st.session_state.variance_from_file,
-            step=0.001,
-            format="%.6f",
-            help="指标的方差值（已从CSV文件自动填充）",
-            key="variance_input"
-        )
-    else:
-        variance = st.number_input(
-            "方差 *",
-            min_value=0.0,
-            value=0.05,
-            step=0.001,
-            format="%.6f",
-            help="指标的方差值",
-            key="variance_input"
-        )
+    variance = st.number_input(
+        "方差 *",
+        min_value=0.0,
+        value=st.session_state.variance_from_file if from_file else 0.05,
+        step=0.001,
+        format="%.6f",
+        help="指标的方差值" + file_suffix,
+        key="variance_input"
+    )
     
     st.divider()
     
@@ -316,47 +393,23 @@ if calculate_button:
         st.error("❌ MDE步长必须大于0")
         st.stop()
     
-    # 生成MDE序列
-    mde_array = np.arange(mde_start, mde_end + mde_step, mde_step)
+    # 生成MDE序列（终点加半个步长，保证结束值稳定落在序列内，
+    # 不受浮点步长累积误差影响）
+    mde_array = np.arange(mde_start, mde_end + mde_step * 0.5, mde_step)
     mde_array = np.round(mde_array, 6)
     
-    # 初始化计算器
-    calculator = SampleSizeCalculator(
-        significance_level=significance_level,
-        power=power
-    )
-    
-    # 计算结果
-    results = []
-    
+    # 计算结果（参数不变时直接命中缓存）
     with st.spinner("正在计算样本量..."):
-        for mde in mde_array:
-            if metric_type == "比例":
-                control_sample = calculator.calculate_binary_metric_sample_size(
-                    baseline_value, mde, k_value
-                )
-            else:  # 均值
-                # 使用基准值和方差直接计算
-                control_sample = calculator.calculate_continuous_metric_sample_size_from_params(
-                    baseline_value, variance, mde, k_value
-                )
-            
-            treatment_sample = math.ceil(control_sample * k_value)
-            total_sample = control_sample + treatment_sample * group_num
-            experiment_days = math.ceil(total_sample / (daily_traffic * traffic_ratio))
-            
-            results.append({
-                'MDE': f"{mde * 100:.2f}%",
-                'MDE值': mde,
-                '对照组': control_sample,
-                '每组实验组': treatment_sample,
-                '总样本': total_sample,
-                '实验天数': experiment_days
-            })
-    
-    # 转换为DataFrame
-    results_df = pd.DataFrame(results)
-    
+        results_df = compute_sweep(
+            metric_type, baseline_value, variance, mde_array, k_value,
+            group_num, daily_traffic, traffic_ratio,
+            significance_level, power
+        )
+
+    if len(results_df) == 0:
+        st.error("❌ 基准值和MDE必须大于0才能计算样本量")
+        st.stop()
+
     # 显示结果信息
     st.success(f"✅ 计算完成！实验组数量: {group_num} (1个对照组 + {group_num}个实验组 = {total_groups}个组别)")
     
@@ -364,23 +417,23 @@ if calculate_button:
     st.subheader("📊 计算结果表")
     
     # 格式化显示
-    display_df = results_df.copy()
-    display_df['对照组'] = display_df['对照组'].apply(lambda x: f"{x:,}")
-    display_df['每组实验组'] = display_df['每组实验组'].apply(lambda x: f"{x:,}")
-    display_df['总样本'] = display_df['总样本'].apply(lambda x: f"{x:,}")
-    display_df['实验天数'] = display_df['实验天数'].apply(lambda x: f"{x:,}")
-    
+    # 千分位格式化：只复制展示所需的列，统一做一遍格式化
+    sample_cols = ['对照组', '每组实验组', '总样本', '实验天数']
+    display_df = results_df[['MDE'] + sample_cols].copy()
+    for col in sample_cols:
+        display_df[col] = display_df[col].map("{:,}".format)
+
     st.dataframe(
-        display_df[['MDE', '对照组', '每组实验组', '总样本', '实验天数']],
+        display_df,
         use_container_width=True,
         hide_index=True
     )
     
-    # 导出按钮
-    csv = results_df[['MDE值', '对照组', '每组实验组', '总样本', '实验天数']].to_csv(index=False)
+    # 导出按钮（结果不变时直接复用缓存的CSV字节串）
+    csv_bytes = _to_csv_bytes(results_df[['MDE值', '对照组', '每组实验组', '总样本', '实验天数']])
     st.download_button(
         label="📥 导出结果",
-        data=csv,
+        data=csv_bytes,
         file_name=f"样本量计算结果_{pd.Timestamp.now().strftime('%Y%m%d')}.csv",
         mime="text/csv"
     )
@@ -416,30 +469,6 @@ if calculate_button:
 else:
     # 初始状态显示
     st.info("👆 请在左侧边栏配置参数，然后点击「计算样本量」按钮开始计算")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("""
-        <div class="metric-card">
-            <h3>📊 参数设置</h3>
-            <p>配置实验参数以计算所需样本量</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div class="metric-card">
-            <h3>📈 结果展示</h3>
-            <p>查看计算结果表和趋势图</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div class="metric-card">
-            <h3>💾 数据导出</h3>
-            <p>导出计算结果为CSV文件</p>
-        </div>
-        """, unsafe_allow_html=True)
+
+    st.markdown(_INTRO_CARDS, unsafe_allow_html=True)
 